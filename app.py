@@ -1,24 +1,66 @@
+import os
 import streamlit as st
 import pandas as pd
-import joblib
-from streamlit.components.v1 import html
+from streamlit.components.v1 import declare_component
 import numpy as np
 
+from feature_encoding import default_values, default_vector, encode_inputs, onehot_index
+from ui_config import UI_CONFIG
+
 # ==============================
-# LOAD MODEL AND METADATA
+# MODEL AND METADATA LOADERS
 # ==============================
-# In a real app, wrap these in a try/except block for better error handling 
-# if the files might not be present.
-try:
-    model = joblib.load("readmission_model.pkl")
-    columns = joblib.load("model_columns.pkl")
-    dtypes = joblib.load("model_dtypes.pkl")
-except FileNotFoundError as e:
-    st.error(f"Required model files not found: {e}. Please ensure 'readmission_model.pkl', 'model_columns.pkl', and 'model_dtypes.pkl' are in the directory.")
-    st.stop()
-except Exception as e:
-    st.error(f"Error loading model artifacts: {e}")
-    st.stop()
+@st.cache_resource(show_spinner=False)
+def load_artifacts():
+    """
+    Load the preprocessor, the XGBoost booster and the training metadata once
+    per process. st.cache_resource shares the returned objects across reruns
+    and sessions (nothing is hashed or copied), so widget interactions never
+    reload the model.
+
+    training.py saves the booster in XGBoost's native JSON format next to the
+    fitted ColumnTransformer; loading those avoids unpickling the whole
+    sklearn pipeline. Older model directories only have the pipeline pickle.
+    Pickles are loaded with mmap_mode="r", which only maps numpy arrays; the
+    booster itself is not shared between worker processes.
+
+    joblib and xgboost are imported here rather than at module level so the
+    page and sidebar render before the heavy imports on a cold start.
+    """
+    import joblib
+    import xgboost as xgb
+
+    if os.path.exists("booster.json") and os.path.exists("preprocess.pkl"):
+        booster = xgb.Booster()
+        booster.load_model("booster.json")
+        preprocess = joblib.load("preprocess.pkl", mmap_mode="r")
+    else:
+        pipeline = joblib.load("readmission_model.pkl", mmap_mode="r")
+        booster = pipeline.named_steps["model"].get_booster()
+        preprocess = pipeline.named_steps["preprocess"]
+    # One thread per prediction so concurrent workers don't contend for cores
+    booster.set_param({"nthread": 1})
+    return (
+        preprocess,
+        booster,
+        joblib.load("model_columns.pkl"),
+        joblib.load("model_dtypes.pkl"),
+    )
+
+def _load_optional(path, fallback):
+    """
+    Load an auxiliary artifact written by training.py, or rebuild it with
+    `fallback()` when the model directory predates that artifact.
+    """
+    if os.path.exists(path):
+        import joblib
+        return joblib.load(path)
+    return fallback()
+
+# Risk gauge, served as a static custom component (components/gauge/index.html)
+gauge = declare_component(
+    "gauge", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "gauge")
+)
 
 
 # ==============================
@@ -40,158 +82,216 @@ st.write("---")
 # ==============================
 st.sidebar.header("📋 Patient Input Fields")
 
-# --- Essential Inputs (Numeric and Age) ---
-age = st.sidebar.selectbox(
-    "Age Range",
-    ["[0-10)", "[10-20)", "[20-30)", "[30-40)", "[40-50)",
-     "[50-60)", "[60-70)", "[70-80)", "[80-90)", "[90-100)"]
-)
+# Inputs live in a form so the script only reruns on submit,
+# not on every keystroke or selection change.
+with st.sidebar.form("patient_form"):
+    inputs = {
+        field["column"]: getattr(st, field["widget"])(field["label"], **field["kwargs"])
+        for field in UI_CONFIG["fields"]
+    }
 
-time_in_hospital = st.sidebar.number_input(
-    "🏥 Time in Hospital (days)",
-    min_value=1, max_value=14, value=3
-)
+    predict_btn = st.form_submit_button("🔍 Predict", use_container_width=True)
 
-num_lab_procedures = st.sidebar.number_input(
-    "🔬 Number of Lab Procedures",
-    min_value=0, max_value=150, value=40
-)
+# ==============================
+# LOAD MODEL
+# ==============================
+# Loaded after the sidebar has rendered, so users can start filling in the
+# form while the model loads on a cold start.
+try:
+    with st.spinner("Loading model..."):
+        preprocess, booster, columns, dtypes = load_artifacts()
+except FileNotFoundError as e:
+    st.error(f"Required model files not found: {e}. Please ensure 'readmission_model.pkl' (or 'booster.json' and 'preprocess.pkl'), 'model_columns.pkl', and 'model_dtypes.pkl' are in the directory.")
+    st.stop()
+except Exception as e:
+    st.error(f"Error loading model artifacts: {e}")
+    st.stop()
 
-num_medications = st.sidebar.number_input(
-    "💊 Number of Medications",
-    min_value=0, max_value=70, value=10
-)
+# ==============================
+# BUILD FULL INPUT ROW
+# ==============================
+@st.cache_data
+def _template():
+    """
+    Build the per-column dtype map and the default row once.
+    Both depend only on the training metadata, not on the user inputs.
+    """
+    # Use 'object' if a column's type is unknown
+    dtype_map = {col: np.dtype(dtypes.get(col, "object")) for col in columns}
+    return dtype_map, default_values(columns, dtypes)
 
-# --- Additional Inputs (Categorical) ---
-# Adding these greatly improves robustness and prediction quality
-race = st.sidebar.selectbox(
-    "👤 Race",
-    ["Caucasian", "AfricanAmerican", "Asian", "Hispanic", "Other"]
-)
+@st.cache_resource
+def load_feature_template():
+    """
+    Pre-encode the default row once and index the model's input features,
+    so single-patient predictions can bypass the ColumnTransformer.
+    Returns (template vector, feature name -> position, one-hot index,
+    absent value). The one-hot index maps each categorical column to the
+    base offset of its block and to the position of each category within it.
+    """
+    feature_names = _load_optional(
+        "feat_names.pkl", lambda: list(preprocess.get_feature_names_out())
+    )
+    feature_index = {name: i for i, name in enumerate(feature_names)}
 
-gender = st.sidebar.selectbox(
-    "🚻 Gender",
-    ["Female", "Male", "Other"]
-)
+    encoded_default = _load_optional("default_vector.pkl", _default_vector)
 
-a1c_result = st.sidebar.selectbox(
-    "🩸 A1C Result",
-    ["None", ">8", ">7", "Norm"]
-)
+    ohe = preprocess.named_transformers_["cat"]
+    onehot = _load_optional("onehot_index.pkl", lambda: onehot_index(ohe))
+    return encoded_default["vector"], feature_index, onehot, encoded_default["absent"]
 
-predict_btn = st.sidebar.button("🔍 Predict", use_container_width=True)
+def _default_vector():
+    """
+    Same pre-encoded default row as training.py writes to default_vector.pkl.
+    """
+    dtype_map, defaults = _template()
+    default_row = pd.DataFrame([defaults], columns=columns).astype(dtype_map)
+    return default_vector(preprocess, default_row)
 
-# ==============================
-# BUILD FULL INPUT ROW
-# ==============================
-def build_input_row():
-    """
-    Reconstruct a full feature vector matching training columns,
-    with correct order and correct dtypes.
-    
-    CRITICAL FIX: Ensure all categorical columns not explicitly set 
-    are defaulted to a value known to the model (e.g., 'Caucasian', 'None').
-    """
-
-    # Create empty row with all training columns
-    df = pd.DataFrame({col: [np.nan] for col in columns}) # Use np.nan for clearer handling
-
-    # --- 1. Insert the user inputs ---
-    df.loc[0, "age"] = age
-    df.loc[0, "time_in_hospital"] = time_in_hospital
-    df.loc[0, "num_lab_procedures"] = num_lab_procedures
-    df.loc[0, "num_medications"] = num_medications
-    
-    # Insert new user inputs
-    if "race" in columns:
-        df.loc[0, "race"] = race
-    if "gender" in columns:
-        df.loc[0, "gender"] = gender
-    if "A1Cresult" in columns: # Check the exact column name used in training
-        df.loc[0, "A1Cresult"] = a1c_result
-
-    # --- 2. Fill missing values with safe defaults ---
-    for col in columns:
-        if pd.isna(df.loc[0, col]):
-            if dtypes.get(col) == "object":
-                # Use a specific, known, safe default for categorical features.
-                # 'Unknown' or '?' is only safe if it was in the training data.
-                # Assuming 'None' or 'Caucasian' are common modes.
-                safe_default = "None" 
-                if col == 'race':
-                    safe_default = 'Caucasian'
-                elif col == 'gender':
-                    safe_default = 'Female'
-                
-                df.loc[0, col] = safe_default
-            else:
-                # Use 0 for missing numeric features
-                df.loc[0, col] = 0
-
-    # --- 3. Enforce correct data types and column order ---
-    df = df[columns] # Ensure correct column order is maintained
-    
-    for col in df.columns:
-        target_dtype = dtypes.get(col, 'object') # Use 'object' if type is unknown
-
-        if target_dtype == "object":
-            df[col] = df[col].astype(str)
-        else:
-            # Use pd.to_numeric and fill any errors (like NaNs) with 0
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(target_dtype)
+def build_input_vector(inputs):
+    """
+    Encode one patient straight into the model's feature space.
+    Starts from the pre-encoded default row and only rewrites the slots of
+    the UI-driven columns; inputs for columns the model was not trained on
+    are ignored.
+    """
+    template, feature_index, onehot, absent = load_feature_template()
+    return encode_inputs(template, absent, feature_index, onehot, inputs)
 
+def read_patients_csv(uploaded):
+    """
+    Read an uploaded patient CSV with the categorical columns as strings.
+    Left to inference, read_csv turns columns of numeric-looking codes
+    (diag_1, diag_3, ...) or all-missing values into floats, which the
+    OneHotEncoder cannot compare with its string categories.
+    Missing values stay NaN, as in the training data.
+    """
+    return pd.read_csv(
+        uploaded, dtype={col: str for col in columns if dtypes.get(col) == "object"}
+    )
+
+def align_columns(df):
+    """
+    Align an uploaded patient table with the training columns: drop unknown
+    columns, add missing ones with their defaults, coerce numeric columns
+    to their training dtypes and normalize missing categorical values to NaN.
+    Categorical columns are expected as strings, see read_patients_csv.
+    """
+    dtype_map, defaults = _template()
+    missing = [col for col in columns if col not in df.columns]
+    df = df.reindex(columns=columns).fillna({col: defaults[col] for col in missing})
+
+    numeric_cols = [col for col in columns if dtype_map[col] != object]
+    df[numeric_cols] = (
+        df[numeric_cols]
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0)
+        .astype({col: dtype_map[col] for col in numeric_cols})
+    )
+
+    # Missing categoricals must be NaN (not None or pd.NA): that is the
+    # missing-value category the encoder was fitted on.
+    categorical_cols = [col for col in columns if dtype_map[col] == object]
+    categorical = df[categorical_cols].astype(object)
+    df[categorical_cols] = categorical.where(categorical.notna(), np.nan)
     return df
 
+@st.cache_resource
+def load_compiled_predictor():
+    """
+    Load the treelite-compiled booster (model.so) if training.py produced one
+    and tl2cgen is installed; otherwise return None and let the app use the
+    XGBoost booster.
+    """
+    if not os.path.exists("model.so"):
+        return None
+    try:
+        import tl2cgen
+    except ImportError:
+        return None
+    return tl2cgen.Predictor("./model.so", nthread=1)
+
+@st.cache_data(max_entries=1024)
+def predict_cached(**inputs):
+    """
+    Predict for one patient from the UI inputs, keyed by training column.
+    The values are plain scalars, so Streamlit hashes them cheaply and
+    repeated identical inputs skip the model entirely.
+    Returns (predicted class, probability of readmission).
+    """
+    x = build_input_vector(inputs)
+    predictor = load_compiled_predictor()
+    if predictor is not None:
+        import tl2cgen
+        prob = predictor.predict(tl2cgen.DMatrix(x, dtype="float32")).reshape(-1)[0]
+    else:
+        # binary:logistic boosters predict the probability of the positive class.
+        # inplace_predict reads the numpy buffer directly, without building a DMatrix.
+        prob = booster.inplace_predict(x)[0]
+    # Same decision threshold as XGBClassifier.predict
+    return int(prob > 0.5), float(prob)
+
 # ==============================
 # RUN PREDICTION
 # ==============================
+# The last submitted inputs and their result are kept in session_state:
+# reruns triggered by other widgets (e.g. the batch upload) re-render the
+# result without rebuilding the input or even hashing it for the cache.
 if predict_btn:
-    input_data = build_input_row()
+    key = tuple(inputs.items())
+    if st.session_state.get("last_key") != key:
+        try:
+            st.session_state["last_result"] = predict_cached(**inputs)
+            st.session_state["last_key"] = key
+        except ValueError as e:
+            st.session_state.pop("last_result", None)
+            st.session_state.pop("last_key", None)
+            # Unknown categories are encoded silently; a ValueError (XGBoostError
+            # included) here means the encoded vector does not fit the booster
+            st.error(f"Prediction Error: The model rejected the encoded input. This usually means the model artifacts (booster, preprocessor and encoding files) come from different training runs. Detailed error: {e}")
+            st.error("Please re-run training.py to regenerate all model artifacts together.")
+        except Exception as e:
+            st.session_state.pop("last_result", None)
+            st.session_state.pop("last_key", None)
+            st.error(f"An unexpected error occurred during prediction: {e}")
 
-    try:
-        # Check the shape and columns before passing to the model (for debugging)
-        # st.write("Input Data Shape:", input_data.shape)
-        # st.write("Input Data Columns:", list(input_data.columns))
-        
-        prediction = model.predict(input_data)[0]
-        # model.predict_proba returns an array, we take the probability of the positive class (index 1)
-        prob = model.predict_proba(input_data)[0][1] 
-
-        st.write("---")
-
-        st.subheader("Prediction Result")
-        if prediction == 1:
-            st.error(f"🔴 **High Risk of Readmission** — Probability: *{prob:.2f}*")
-            st.warning("The model suggests this patient is likely to be readmitted within 30 days. Recommend follow-up care and patient education.")
-        else:
-            st.success(f"🟢 **Low Risk of Readmission** — Probability: *{prob:.2f}*")
-            st.info("The model suggests this patient is unlikely to be readmitted within 30 days. Continue standard discharge protocol.")
-
-        # Probability Gauge
-        gauge_html = f"""
-        <div style="width:100%; text-align:center;">
-            <h3 style="margin-top: 20px;">Risk Probability Gauge</h3>
-            <svg width="220" height="110" viewBox="0 0 220 110">
-                <!-- Background Arc -->
-                <path d="M10 100 A90 90 0 0 1 210 100" fill="none" stroke="#e0e0e0" stroke-width="18" />
-                <!-- Foreground Arc based on probability -->
-                <path id="riskArc" d="M10 100 A90 90 0 0 1 {10 + prob*200} 100"
-                      fill="none" stroke="#ff4d4d" stroke-width="18" 
-                      stroke-linecap="round" />
-                <!-- Needle/Indicator -->
-                <circle cx="{10 + prob*200}" cy="100" r="10" fill="#ff4d4d" stroke="#fff" stroke-width="2" />
-            </svg>
-            <p style="font-size:18px;font-weight:bold; color: #333;">{prob:.1%} Risk</p>
-        </div>
-        """
-        html(gauge_html, height=180)
+if "last_result" in st.session_state:
+    prediction, prob = st.session_state["last_result"]
+
+    st.write("---")
+
+    st.subheader("Prediction Result")
+    if prediction == 1:
+        st.error(f"🔴 **High Risk of Readmission** — Probability: *{prob:.2f}*")
+        st.warning("The model suggests this patient is likely to be readmitted within 30 days. Recommend follow-up care and patient education.")
+    else:
+        st.success(f"🟢 **Low Risk of Readmission** — Probability: *{prob:.2f}*")
+        st.info("The model suggests this patient is unlikely to be readmitted within 30 days. Continue standard discharge protocol.")
 
+    # Probability Gauge: a static component whose DOM is updated in place
+    # (stable key), instead of rebuilding an HTML iframe on every rerun.
+    gauge(prob=prob, key="risk_gauge")
+
+
+# ==============================
+# BATCH PREDICTION
+# ==============================
+st.write("---")
+st.subheader("📂 Batch Prediction")
+st.write("Upload a CSV with one patient per row (same columns as the training data) to score them all at once.")
+
+uploaded = st.file_uploader("Upload patient CSV", type="csv")
+
+if uploaded is not None:
+    try:
+        batch = align_columns(read_patients_csv(uploaded))
+        # A single predict call over all rows amortizes the pipeline overhead
+        probs = booster.inplace_predict(preprocess.transform(batch))
+        st.dataframe(batch.assign(risk=probs), use_container_width=True)
     except ValueError as e:
-        # Catch the specific ValueError related to unseen data or pipeline issue
-        st.error(f"Prediction Error: The model encountered an issue processing the input data. This usually means a feature name or categorical value is not recognized by the pre-processing pipeline. Detailed error: {e}")
-        st.error("Please verify that all categorical defaults are known categories from the training set.")
+        st.error(f"Prediction Error: The uploaded file could not be processed by the model. Detailed error: {e}")
     except Exception as e:
-        st.error(f"An unexpected error occurred during prediction: {e}")
+        st.error(f"An unexpected error occurred during batch prediction: {e}")
 
 
 st.write("---")
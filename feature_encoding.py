@@ -0,0 +1,81 @@
+# ==============================
+# FEATURE ENCODING HELPERS
+# ==============================
+# Shared by training.py (which persists their output next to the model) and
+# app.py (which rebuilds it for model directories that predate those files),
+# so both always encode single rows the same way.
+import numpy as np
+import pandas as pd
+
+from ui_config import UI_CONFIG
+
+
+def default_values(columns, dtypes):
+    """
+    Default value of every training column the UI does not set, see UI_CONFIG.
+    `dtypes` maps column -> dtype name, as saved in model_dtypes.pkl.
+    """
+    categorical_defaults = UI_CONFIG["categorical_defaults"]
+    return {
+        col: categorical_defaults.get(col, UI_CONFIG["fallback_categorical"])
+        if np.dtype(dtypes.get(col, "object")) == object else 0
+        for col in columns
+    }
+
+
+def onehot_index(ohe):
+    """
+    Base offset of each categorical column's one-hot block and the position
+    of every category within it. The one-hot blocks come first in the
+    ColumnTransformer output, one per column in order.
+    """
+    base, positions, offset = {}, {}, 0
+    for col, categories in zip(ohe.feature_names_in_, ohe.categories_):
+        base[col] = offset
+        positions[col] = {cat: idx for idx, cat in enumerate(categories)}
+        offset += len(categories)
+    return {"base": base, "positions": positions}
+
+
+def default_vector(preprocess, default_row):
+    """
+    Encode the default row into a dense float32 vector. Returns the vector and
+    the value that stands for an absent feature.
+    """
+    template = preprocess.transform(default_row)
+
+    # XGBoost treats entries absent from a sparse matrix as missing, not as 0.
+    # If the pipeline produced sparse features, the dense vector must use NaN
+    # for those entries to get the same predictions.
+    if hasattr(template, "toarray"):
+        template = template.toarray()
+        absent = np.nan
+    else:
+        absent = 0.0
+    # float32 is XGBoost's native input type: no conversion copy per predict
+    template = np.asarray(template, dtype=np.float32)
+    template[template == 0] = absent
+    return {"vector": template, "absent": absent}
+
+
+def encode_inputs(template, absent, feature_index, onehot, inputs):
+    """
+    Encode one patient from the pre-encoded default row: copy the template
+    and rewrite only the slots of the given columns. Inputs for columns the
+    model was not trained on are ignored.
+    """
+    base, positions = onehot["base"], onehot["positions"]
+    x = template.copy()
+
+    for col, value in inputs.items():
+        if col in positions:
+            start = base[col]
+            x[0, start:start + len(positions[col])] = absent
+            # Unseen categories stay all-absent, like handle_unknown='ignore'
+            pos = positions[col].get(value)
+            if pos is not None:
+                x[0, start + pos] = 1.0
+        elif f"remainder__{col}" in feature_index:
+            x[0, feature_index[f"remainder__{col}"]] = value if value != 0 else absent
+
+    return x
@@ -1,3 +1,5 @@
+import os
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder
@@ -7,10 +9,27 @@ from sklearn.metrics import classification_report
 from xgboost import XGBClassifier
 import joblib
 
+from feature_encoding import default_values, default_vector, encode_inputs, onehot_index
+from ui_config import UI_CONFIG
+
 # =======================
 # LOAD DATA
 # =======================
-df = pd.read_csv("diabetic_data.csv")
+# CSV -> Parquet conversion, redone whenever the CSV is newer than the cached
+# copy; other runs load the columnar copy, which pyarrow reads multi-threaded
+# and much faster than the CSV.
+if (not os.path.exists("diabetic_data.parquet")
+        or os.path.getmtime("diabetic_data.csv") > os.path.getmtime("diabetic_data.parquet")):
+    pd.read_csv("diabetic_data.csv").to_parquet("diabetic_data.parquet", engine="pyarrow")
+
+# Keep the default numpy dtypes: string columns must stay "object" for the
+# select_dtypes() split below and for model_dtypes.pkl used by the app.
+df = pd.read_parquet("diabetic_data.parquet", engine="pyarrow")
+# Parquet nulls come back as None in object columns, while read_csv (used by
+# the app for uploads) gives NaN. The encoder treats them as different
+# categories, so restore NaN as the missing value.
+object_cols = df.select_dtypes(include=["object"]).columns
+df[object_cols] = df[object_cols].where(df[object_cols].notna(), np.nan)
 
 # Keep <30 and >30 only
 df = df[df["readmitted"] != "NO"]
@@ -41,7 +60,13 @@ preprocess = ColumnTransformer(
 # =======================
 # MODEL
 # =======================
+# Histogram-based training on the CPU by default; run with XGB_DEVICE=cuda
+# to train on a GPU
+device = os.environ.get("XGB_DEVICE", "cpu")
+
 model = XGBClassifier(
+    tree_method="hist",
+    device=device,
     eval_metric="logloss",
     max_depth=5,
     n_estimators=200,
@@ -71,7 +96,88 @@ print(classification_report(y_test, preds))
 # =======================
 # SAVE TRAINED MODEL
 # =======================
-joblib.dump(pipeline, "readmission_model.pkl")
+# The app predicts on CPU inside Streamlit workers: a single thread per
+# prediction avoids oversubscribing cores across workers.
+pipeline.named_steps["model"].set_params(n_jobs=1, device="cpu")
+
+# Keep the pickle uncompressed: the app loads it with mmap_mode="r", which
+# only works on uncompressed joblib files.
+joblib.dump(pipeline, "readmission_model.pkl", compress=0)
+# The booster in XGBoost's native JSON format plus the fitted preprocessor:
+# the app loads these instead of unpickling the whole pipeline.
+pipeline.named_steps["model"].get_booster().save_model("booster.json")
+joblib.dump(pipeline.named_steps["preprocess"], "preprocess.pkl", compress=0)
+# Encoded feature names, used by the app to encode single rows without the ColumnTransformer
+preprocess = pipeline.named_steps["preprocess"]
+feature_names = list(preprocess.get_feature_names_out())
+joblib.dump(feature_names, "feat_names.pkl")
+# Position of every category in the encoded vector, so the app can set
+# one-hot slots by index
+onehot = onehot_index(preprocess.named_transformers_["cat"])
+joblib.dump(onehot, "onehot_index.pkl")
+# Pre-encoded default row: the app starts every single-patient prediction from
+# this vector and only overwrites the slots of the UI-driven columns
+model_dtypes = X.dtypes.astype(str).to_dict()
+default_row = pd.DataFrame(
+    [default_values(X.columns, model_dtypes)], columns=X.columns
+).astype(X.dtypes.to_dict())
+encoded_default = default_vector(preprocess, default_row)
+joblib.dump(encoded_default, "default_vector.pkl")
+
+# The app predicts single rows from this dense encoding, not through the
+# pipeline: check both agree for the default row and for a row with every UI
+# field changed, so an encoding drift fails here instead of skewing risk scores.
+booster = pipeline.named_steps["model"].get_booster()
+feature_index = {name: i for i, name in enumerate(feature_names)}
+ui_inputs = {
+    field["column"]: field["kwargs"]["options"][-1]
+    if field["widget"] == "selectbox" else field["kwargs"]["max_value"]
+    for field in UI_CONFIG["fields"]
+}
+ui_row = default_row.copy()
+for col, value in ui_inputs.items():
+    if col in ui_row.columns:
+        ui_row[col] = value
+for row, inputs in ((default_row, {}), (ui_row, ui_inputs)):
+    x = encode_inputs(
+        encoded_default["vector"], encoded_default["absent"], feature_index, onehot, inputs
+    )
+    np.testing.assert_allclose(
+        booster.inplace_predict(x),
+        pipeline.predict_proba(row)[:, 1],
+        rtol=1e-5,
+        err_msg="Dense single-row encoding does not match the pipeline",
+    )
 print("\nModel saved as readmission_model.pkl")
+print("Booster saved as booster.json, preprocessor as preprocess.pkl")
 print("Columns saved as model_columns.pkl")
-print("Dtypes saved as model_dtypes.pkl")
\ No newline at end of file
+print("Dtypes saved as model_dtypes.pkl")
+print("Feature names saved as feat_names.pkl")
+print("One-hot index saved as onehot_index.pkl")
+print("Default vector saved as default_vector.pkl")
+
+# =======================
+# OPTIONAL: COMPILED PREDICTOR
+# =======================
+# With treelite + tl2cgen installed, compile the booster into a native shared
+# library with quantized thresholds. The app picks model.so up automatically
+# and falls back to XGBoost when it is missing.
+try:
+    import treelite
+    import tl2cgen
+except ImportError:
+    # A model.so left over from an earlier run was compiled from a different
+    # booster; remove it so the app does not serve stale predictions.
+    if os.path.exists("model.so"):
+        os.remove("model.so")
+        print("Removed stale model.so from a previous training run")
+    print("treelite/tl2cgen not installed, skipping compiled predictor")
+else:
+    tl_model = treelite.frontend.from_xgboost(pipeline.named_steps["model"].get_booster())
+    tl2cgen.export_lib(
+        tl_model,
+        toolchain="gcc",
+        libpath="./model.so",
+        params={"parallel_comp": 4, "quantize": 1},
+    )
+    print("Compiled predictor saved as model.so")
@@ -0,0 +1,66 @@
+# ==============================
+# UI CONFIGURATION
+# ==============================
+# Everything that differs between deployments of the predictor UI lives here;
+# app.py has a single code path driven by this config.
+UI_CONFIG = {
+    # Sidebar input fields, in display order.
+    # `column` is the training column the field fills, `widget` the Streamlit
+    # widget used to render it and `kwargs` are passed to that widget as-is.
+    "fields": [
+        # --- Essential Inputs (Numeric and Age) ---
+        {
+            "column": "age",
+            "label": "Age Range",
+            "widget": "selectbox",
+            "kwargs": {
+                "options": ["[0-10)", "[10-20)", "[20-30)", "[30-40)", "[40-50)",
+                            "[50-60)", "[60-70)", "[70-80)", "[80-90)", "[90-100)"],
+            },
+        },
+        {
+            "column": "time_in_hospital",
+            "label": "🏥 Time in Hospital (days)",
+            "widget": "number_input",
+            "kwargs": {"min_value": 1, "max_value": 14, "value": 3},
+        },
+        {
+            "column": "num_lab_procedures",
+            "label": "🔬 Number of Lab Procedures",
+            "widget": "number_input",
+            "kwargs": {"min_value": 0, "max_value": 150, "value": 40},
+        },
+        {
+            "column": "num_medications",
+            "label": "💊 Number of Medications",
+            "widget": "number_input",
+            "kwargs": {"min_value": 0, "max_value": 70, "value": 10},
+        },
+        # --- Additional Inputs (Categorical) ---
+        # Adding these greatly improves robustness and prediction quality
+        {
+            "column": "race",
+            "label": "👤 Race",
+            "widget": "selectbox",
+            "kwargs": {"options": ["Caucasian", "AfricanAmerican", "Asian", "Hispanic", "Other"]},
+        },
+        {
+            "column": "gender",
+            "label": "🚻 Gender",
+            "widget": "selectbox",
+            "kwargs": {"options": ["Female", "Male", "Other"]},
+        },
+        {
+            "column": "A1Cresult",
+            "label": "🩸 A1C Result",
+            "widget": "selectbox",
+            "kwargs": {"options": ["None", ">8", ">7", "Norm"]},
+        },
+    ],
+    # Safe defaults for every training column the UI does not set.
+    # Categorical features must default to a value known to the model:
+    # 'None' is a common mode, with 'Caucasian' / 'Female' for race / gender.
+    # Numeric features default to 0.
+    "categorical_defaults": {"race": "Caucasian", "gender": "Female"},
+    "fallback_categorical": "None",
+}